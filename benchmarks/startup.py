@@ -0,0 +1,78 @@
+"""
+Cold-start import benchmark.
+
+Imports a module (default: fast_api_server.main) in fresh interpreters with
+`python -X importtime`, then reports the slowest modules by cumulative import
+time and the best-of-N wall time. Exits non-zero when over --budget-ms so it can
+gate CI.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --top 30 --runs 5 --budget-ms 600
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_times(module: str) -> Dict[str, Tuple[int, int, int]]:
+    """module name -> (self us, cumulative us, nesting depth) for one cold import"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr}")
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times[name] = (int(self_us), int(cumulative_us), (len(indent) - 1) // 2)
+    return times
+
+
+def wall_time(module: str) -> float:
+    """Seconds for a fresh interpreter to import `module` and exit"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT, check=True)
+    return time.perf_counter() - start
+
+
+def report(module: str, top: int, runs: int) -> float:
+    times = import_times(module)
+    ranked: List[Tuple[str, Tuple[int, int, int]]] = sorted(times.items(), key=lambda item: item[1][1], reverse=True)
+
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, (self_us, cumulative_us, depth) in ranked[:top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {'  ' * depth}{name}")
+
+    total_ms = times[module][1] / 1000 if module in times else sum(t[0] for t in times.values()) / 1000
+    best_ms = min(wall_time(module) for _ in range(runs)) * 1000
+    print(f"\nimport {module}: {total_ms:.1f}ms (importtime), best of {runs} interpreter runs: {best_ms:.1f}ms")
+    return total_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="fast_api_server.main", help="module to import")
+    parser.add_argument("--top", type=int, default=20, help="number of modules to list")
+    parser.add_argument("--runs", type=int, default=3, help="interpreter runs for wall time")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail when the import takes longer")
+    args = parser.parse_args()
+
+    total_ms = report(args.module, args.top, args.runs)
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        sys.exit(f"cold-start budget exceeded: {total_ms:.1f}ms > {args.budget_ms:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Protocol
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -9,6 +10,24 @@ class InternalConfigProtocol(Protocol):
     DOORDASH_DB_PW : str
     DOORDASH_WEBHOOK_ID : str
     DOORDASH_WEBHOOK_SECRET : str
+    DOORDASH_RECONCILE_ENABLED : bool
+    DOORDASH_RECONCILE_SCAN_SECONDS : int
+    DOORDASH_RECONCILE_MAX_AGE_HOURS : int
+    DOORDASH_RECONCILE_CONCURRENCY : int
+    DOORDASH_RECONCILE_RATE_PER_SECOND : float
+    DOORDASH_STREAM_QUEUE_SIZE : int
+    DOORDASH_STREAM_SNAPSHOT_HOURS : int
+    DOORDASH_PROFILING_ENABLED : bool
+    DOORDASH_PROFILING_TOKEN : str
+    DOORDASH_PROFILING_SLOW_MS : int
+    DOORDASH_PROFILING_INTERVAL_MS : float
+    DOORDASH_PROFILING_DIR : str
+    DOORDASH_PROFILING_MAX_FILES : int
+    DOORDASH_OUTBOX_ENABLED : bool
+    DOORDASH_OUTBOX_SPOOL_DIR : str
+    DOORDASH_OUTBOX_POLL_SECONDS : int
+    DOORDASH_OUTBOX_BATCH_SIZE : int
+    DOORDASH_OUTBOX_MAX_ATTEMPTS : int
 
 class InternalConfig(BaseSettings):
     model_config = SettingsConfigDict(
@@ -22,5 +41,30 @@ class InternalConfig(BaseSettings):
     DOORDASH_DB_PW : str = Field(...,description="")
     DOORDASH_WEBHOOK_ID : str = Field(...,description="")
     DOORDASH_WEBHOOK_SECRET : str = Field(...,description="")
+    # Optional: background reconciliation of deliveries with missed webhooks
+    DOORDASH_RECONCILE_ENABLED : bool = Field(True, description="Poll DoorDash for deliveries with stale status")
+    DOORDASH_RECONCILE_SCAN_SECONDS : int = Field(60, description="Seconds between reconciliation scans")
+    DOORDASH_RECONCILE_MAX_AGE_HOURS : int = Field(24, description="Ignore deliveries created before this many hours ago")
+    DOORDASH_RECONCILE_CONCURRENCY : int = Field(4, description="Max concurrent DoorDash status requests")
+    DOORDASH_RECONCILE_RATE_PER_SECOND : float = Field(2.0, description="Max DoorDash status requests per second")
+    # Optional: delivery status stream
+    DOORDASH_STREAM_QUEUE_SIZE : int = Field(100, description="Max buffered updates per stream client before the oldest are dropped")
+    DOORDASH_STREAM_SNAPSHOT_HOURS : int = Field(24, description="New stream clients first get the latest status of deliveries created this many hours back")
+    # Optional: debug profiling (off by default)
+    DOORDASH_PROFILING_ENABLED : bool = Field(False, description="Install the request profiling middleware")
+    DOORDASH_PROFILING_TOKEN : str = Field("", description="Admin secret; requests sending it in X-Profile-Token are profiled")
+    DOORDASH_PROFILING_SLOW_MS : int = Field(0, description="Capture a profile for requests slower than this (0 disables)")
+    DOORDASH_PROFILING_INTERVAL_MS : float = Field(5.0, description="Stack sampling interval")
+    DOORDASH_PROFILING_DIR : str = Field("data/profiles", description="Directory for captured .folded profiles")
+    DOORDASH_PROFILING_MAX_FILES : int = Field(50, description="Profiles kept in DOORDASH_PROFILING_DIR; the oldest are deleted")
+    # Optional: outbox for DoorDash writes during upstream / database outages
+    DOORDASH_OUTBOX_ENABLED : bool = Field(True, description="Run the outbox dispatcher in this worker")
+    DOORDASH_OUTBOX_SPOOL_DIR : str = Field("data/outbox", description="Local spool for outbox entries while PostgreSQL is unavailable")
+    DOORDASH_OUTBOX_POLL_SECONDS : int = Field(5, description="Seconds between outbox dispatch passes")
+    DOORDASH_OUTBOX_BATCH_SIZE : int = Field(20, description="Max outbox entries sent per pass")
+    DOORDASH_OUTBOX_MAX_ATTEMPTS : int = Field(10, description="Attempts before an outbox entry is marked failed")
     
-config: InternalConfigProtocol = InternalConfig(_env_file="config/internal/.env")  # type: ignore
+@lru_cache(maxsize=None)
+def get_config() -> InternalConfigProtocol:
+    """Load config/internal/.env on first use; every later call shares the same instance"""
+    return InternalConfig(_env_file="config/internal/.env")  # type: ignore
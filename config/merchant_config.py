@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Protocol
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -20,4 +21,7 @@ class MerchantConfig(BaseSettings):
     PICKUP_ADDRESS : str = Field(...,description="Required: Merchant store address")
     PICKUP_PHONE_NUMBER :str = Field(...,description="Required: Merchant store phone #")
 
-config: MerchantConfigProtocol = MerchantConfig()  # type: ignore
+@lru_cache(maxsize=None)
+def get_config() -> MerchantConfigProtocol:
+    """Load config/.env on first use; every later call shares the same instance"""
+    return MerchantConfig()  # type: ignore
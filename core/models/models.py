@@ -1,23 +1,32 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 from pydantic import BaseModel, Field
-from config.merchant_config import config as store_config
+from config.merchant_config import get_config as get_store_config
+
+
+def store_default(name: str) -> Callable[[], str]:
+    """
+    default_factory for merchant config defaults - config/.env is read when a
+    model is first instantiated instead of when this module is imported
+    """
+    return lambda: getattr(get_store_config(), name)
+
 # ========================
 # Pydantic Models
 # ========================
 
 class UpdateStoreRequest(BaseModel):
-    external_business_id : str = Field(store_config.PICKUP_EXTERNAL_BUSINESS_ID, description="")
-    external_store_id : str = Field(store_config.PICKUP_EXTERNAL_STORE_ID, description="")
+    external_business_id : str = Field(default_factory=store_default("PICKUP_EXTERNAL_BUSINESS_ID"), description="")
+    external_store_id : str = Field(default_factory=store_default("PICKUP_EXTERNAL_STORE_ID"), description="")
     name : str = Field(..., description="(warning): rename store")
     phone_number : str = Field(..., description="(warning): update store phone number")
     address : str = Field(..., description="(warning): update store address")
     
 class DeliveryBase(BaseModel):
     external_delivery_id: str = Field(..., description="Your internal reference ID for the delivery")
-    pickup_address: str = Field(store_config.PICKUP_ADDRESS)
-    pickup_external_business_id: str = Field(store_config.PICKUP_EXTERNAL_BUSINESS_ID, description="")
-    pickup_external_store_id: str = Field(default_factory=lambda: store_config.PICKUP_EXTERNAL_STORE_ID)
-    pickup_phone_number: str = Field(store_config.PICKUP_PHONE_NUMBER)
+    pickup_address: str = Field(default_factory=store_default("PICKUP_ADDRESS"))
+    pickup_external_business_id: str = Field(default_factory=store_default("PICKUP_EXTERNAL_BUSINESS_ID"), description="")
+    pickup_external_store_id: str = Field(default_factory=store_default("PICKUP_EXTERNAL_STORE_ID"))
+    pickup_phone_number: str = Field(default_factory=store_default("PICKUP_PHONE_NUMBER"))
     dropoff_phone_number: str = Field(..., description="Required dropoff contact phone")
     dropoff_address: str = Field(..., description="Required dropoff address")
     dropoff_address_components:Dict[str, Any] = Field(...,description= "")
@@ -109,7 +118,7 @@ class ListStoreRequest(BaseModel):
     """
     Request for list of company's stores registered with Doordash Drive API
     """
-    external_business_id: str = store_config.PICKUP_EXTERNAL_BUSINESS_ID
+    external_business_id: str = Field(default_factory=store_default("PICKUP_EXTERNAL_BUSINESS_ID"))
 class ListStoreResponse(BaseModel):
     """
     Response for list of company's stores registered with Doordash Drive API
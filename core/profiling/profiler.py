@@ -0,0 +1,188 @@
+import asyncio
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, Optional, Tuple
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from config.internal.internal_config import get_config
+from core.logging.logger import logger
+
+PROFILE_HEADER = "X-Profile-Token"
+
+# At most one slow-request capture per this many seconds; during an upstream
+# slowdown every request is slow and one profile shows the same thing as a hundred
+SLOW_CAPTURE_SECONDS = 10
+
+# Module prefixes used to attribute samples to where the time went
+POSTGRES_MODULES = ("psycopg",)
+UPSTREAM_MODULES = ("requests", "urllib3", "http.client", "ssl", "socket")
+APP_MODULES = ("fast_api_server", "core", "config")
+
+
+def fold_stack(frame) -> str:
+    """Render a frame's stack root-first in collapsed (flamegraph.pl / speedscope) format"""
+    names = []
+    while frame is not None:
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def classify(stack: str) -> str:
+    modules = [name.split(":", 1)[0] for name in stack.split(";")]
+    if any(m.startswith(POSTGRES_MODULES) for m in modules):
+        return "postgres"
+    if any(m.startswith(UPSTREAM_MODULES) for m in modules):
+        return "upstream"
+    # a loop waiting for I/O has no app frames on the stack; under uvloop the wait
+    # is in C, so the stack ends in uvicorn/asyncio rather than selectors
+    if not any(m.startswith(APP_MODULES) for m in modules):
+        return "idle"
+    return "python"
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples one thread's Python stack every `interval` seconds into a ring buffer.
+
+    Endpoints and doordash_request block the event loop thread, so sampling that
+    thread shows whether a slow request is waiting on DoorDash, Postgres or Python.
+    Samples are not per-request: concurrent requests on the loop share them.
+    """
+
+    def __init__(self, target_ident: int, interval: float, max_samples: int):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.target_ident = target_ident
+        self.interval = interval
+        self.samples: Deque[Tuple[float, str]] = deque(maxlen=max_samples)
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target_ident)
+            if frame is not None:
+                self.samples.append((time.perf_counter(), fold_stack(frame)))
+            del frame
+
+    def stop(self):
+        self.stopped.set()
+
+    def window(self, start: float, end: float) -> Counter:
+        return Counter(stack for at, stack in list(self.samples) if start <= at <= end)
+
+
+class RequestProfiler:
+    """Decides which requests to profile and writes their collapsed stacks to DOORDASH_PROFILING_DIR"""
+
+    def __init__(self):
+        config = get_config()
+        self.token = config.DOORDASH_PROFILING_TOKEN
+        self.directory = config.DOORDASH_PROFILING_DIR
+        self.interval = config.DOORDASH_PROFILING_INTERVAL_MS / 1000
+        self.slow_seconds = config.DOORDASH_PROFILING_SLOW_MS / 1000
+        self.max_files = max(1, config.DOORDASH_PROFILING_MAX_FILES)
+        self.last_slow_capture = float("-inf")
+        # continuous sampler for slow-request capture, started on the first request
+        self.sampler: Optional[StackSampler] = None
+
+    def authorized(self, request: Request) -> bool:
+        token = request.headers.get(PROFILE_HEADER)
+        return bool(token) and bool(self.token) and hmac.compare_digest(token, self.token)
+
+    def continuous_sampler(self) -> StackSampler:
+        if self.sampler is None:
+            # keep ~60s of history so any request under a minute can be recovered
+            self.sampler = StackSampler(threading.get_ident(), self.interval, int(60 / self.interval))
+            self.sampler.start()
+        return self.sampler
+
+    async def __call__(self, request: Request, call_next):
+        requested = self.authorized(request)
+        if not requested and not self.slow_seconds:
+            return await call_next(request)
+
+        if self.slow_seconds:
+            sampler = self.continuous_sampler()
+        else:
+            sampler = StackSampler(threading.get_ident(), self.interval, 1_000_000)
+            sampler.start()
+
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            end = time.perf_counter()
+            if sampler is not self.sampler:
+                sampler.stop()
+
+        elapsed = end - start
+        slow = elapsed >= self.slow_seconds and end - self.last_slow_capture >= SLOW_CAPTURE_SECONDS
+        if requested or slow:
+            if not requested:
+                self.last_slow_capture = end
+            stacks = sampler.window(start, end)
+            reason = "requested" if requested else "slow"
+            path = await asyncio.to_thread(self.write, request, reason, elapsed, stacks)
+            summary = self.summarize(stacks)
+            logger.info(f"Profiled {request.method} {request.url.path} ({reason}, {elapsed * 1000:.0f}ms): {summary} -> {path}")
+            if requested:
+                # file name only; the server's directory layout stays private
+                response.headers["X-Profile-File"] = os.path.basename(path)
+                response.headers["X-Profile-Summary"] = summary
+        return response
+
+    @staticmethod
+    def summarize(stacks: Counter) -> str:
+        total = sum(stacks.values())
+        if not total:
+            return "no samples"
+        shares: Dict[str, int] = Counter()
+        for stack, count in stacks.items():
+            shares[classify(stack)] += count
+        return ";".join(f"{name}={count * 100 // total}%" for name, count in sorted(shares.items()))
+
+    def write(self, request: Request, reason: str, elapsed: float, stacks: Counter) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", request.url.path).strip("_") or "root"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms-{request.method}-{slug}-{reason}.folded"
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self.prune()
+        return path
+
+    def prune(self):
+        """Keep the newest max_files profiles; they share the data volume with the outbox spool"""
+        # names start with the capture time, so sorting gives oldest first
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(".folded"))
+        for name in names[:-self.max_files]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware which passes requests straight through unless the lifespan put
+    a RequestProfiler on app.state, so disabled profiling costs one attribute lookup
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.profiled_app = None
+
+    async def __call__(self, scope, receive, send):
+        profiler = getattr(scope["app"].state, "profiler", None) if scope["type"] == "http" else None
+        if profiler is None:
+            await self.app(scope, receive, send)
+            return
+        if self.profiled_app is None:
+            self.profiled_app = BaseHTTPMiddleware(self.app, dispatch=profiler)
+        await self.profiled_app(scope, receive, send)
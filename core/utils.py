@@ -1,6 +1,8 @@
-from typing import Any, List, Dict, Generic, TypeVar
-from psycopg import sql
-from psycopg.sql import Composed
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, List, Dict, Generic, TypeVar
+
+if TYPE_CHECKING:
+    from psycopg.sql import Composed
 
 TValue = TypeVar("TValue")
 class Ref(Generic[TValue]):
@@ -14,17 +16,20 @@ def add_query_field(
     target: Ref[Composed| None],
     default: ColType
 ) -> ColType:
+    from psycopg import sql
 
     if target.value:
         target.value = target.value + sql.SQL(", ") + sql.Identifier(col_name)
     else:
-        target.value =  Composed([sql.Identifier(col_name)])
+        target.value =  sql.Composed([sql.Identifier(col_name)])
     return getattr(source,col_name,default)
 
 def insert_query(table : str, field_names : Composed, values : List[Any]) -> Composed:
     """
          
     """
+    from psycopg import sql
+
     query = sql.SQL("INSERT INTO {} ({}) VALUES({}) RETURNING id").format(
         sql.Identifier(table),
         field_names,#.join(", ").as_string(conn),
@@ -8,20 +8,52 @@ version: 1.0.1
 licence: MIT
 """
 from __future__ import annotations
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.requests import Request
-from config.internal.internal_config import config
+from config.internal.internal_config import get_config
+from config.merchant_config import get_config as get_merchant_config
+from core.profiling.profiler import PROFILE_HEADER, ProfilingMiddleware, RequestProfiler
 from fast_api_server.routers.doordash import router as doordash_router
 from fast_api_server.routers.webhooks import router as webhook_router
+from fast_api_server.routers.stream import router as stream_router
+from fast_api_server.services.broadcaster import broadcaster
+from fast_api_server.services.outbox import dispatcher
+from fast_api_server.services.reconciler import reconciler
+from fast_api_server.services.schema import ensure_schema
 from core.logging.logger import logger
 
-if not all([config.DOORDASH_DEVELOPER_ID, config.DOORDASH_KEY_ID, config.DOORDASH_SIGNING_SECRET, config.DOORDASH_DB_PW]):
-    raise RuntimeError(
-        "Missing required environment variables: DOORDASH_DEVELOPER_ID, DOORDASH_KEY_ID, DOORDASH_SIGNING_SECRET, DOORDASH_DB_PW"
-    )
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # .env files are loaded and validated once per worker here, not at import;
+    # modules share the same instances through get_config()
+    config = get_config()
+    if not all([config.DOORDASH_DEVELOPER_ID, config.DOORDASH_KEY_ID, config.DOORDASH_SIGNING_SECRET, config.DOORDASH_DB_PW]):
+        raise RuntimeError(
+            "Missing required environment variables: DOORDASH_DEVELOPER_ID, DOORDASH_KEY_ID, DOORDASH_SIGNING_SECRET, DOORDASH_DB_PW"
+        )
+    # validate config/.env now rather than on the first request
+    get_merchant_config()
+    app.state.profiler = RequestProfiler() if config.DOORDASH_PROFILING_ENABLED else None
+
+    # background tasks retry this themselves if PostgreSQL is not up yet
+    await asyncio.to_thread(ensure_schema)
+    broadcaster.start()
+    if config.DOORDASH_RECONCILE_ENABLED:
+        reconciler.start()
+    if config.DOORDASH_OUTBOX_ENABLED:
+        dispatcher.start()
+    try:
+        yield
+    finally:
+        await dispatcher.stop()
+        await reconciler.stop()
+        await broadcaster.stop()
 
 app = FastAPI(
+    lifespan=lifespan,
     title="DoorDash Drive API",
     version="1.0.2",
     description="Provides HTTP endpoints for DoorDash Drive (quotes, deliveries) and Developer (businesses, stores) APIs",
@@ -35,12 +67,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# credentials which must never reach the log
+REDACTED_HEADERS = {"authorization", PROFILE_HEADER.lower()}
+
+def redact_headers(headers) -> dict:
+    return {name: "***" if name.lower() in REDACTED_HEADERS else value for name, value in headers.items()}
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     # Read and log the request body (FastAPI caches it)
     body = await request.body()
     logger.info(f"→ {request.method} {request.url}")
-    logger.info(f"Headers: {dict(request.headers)}")
+    logger.info(f"Headers: {redact_headers(request.headers)}")
     logger.info(f"Body: {body.decode('utf-8', errors='replace') or ''}")
     # Let the request proceed unchanged
     response = await call_next(request)
@@ -48,6 +86,10 @@ async def log_requests(request: Request, call_next):
     logger.info(f"← {response.status_code}")
     return response
 
+# pass-through unless DOORDASH_PROFILING_ENABLED (checked in lifespan)
+app.add_middleware(ProfilingMiddleware)
+
 app.include_router(doordash_router)
 app.include_router(webhook_router)
+app.include_router(stream_router)
 
@@ -1,19 +1,63 @@
-from typing import Optional
-import psycopg
-from psycopg.types.json import Jsonb
-from fastapi import APIRouter, Body
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Body, Header, HTTPException
+from fastapi.responses import JSONResponse
 from core.models import (
     ListStoreRequest, ListStoreResponse,
     UpdateStoreRequest, CreateQuoteRequest, CancelDeliveryRequest,
     AcceptQuoteRequest, UpdateDeliveryRequest,
     GetDeliveryRequest, CreateDeliveryRequest, DoorDashResponse,  )
-from fast_api_server.services.doordash_client import doordash_request
+from fast_api_server.services.doordash_client import assign_external_delivery_id, doordash_request
+from fast_api_server.services import outbox
 from core.logging.logger import logger
-from config.merchant_config import config as settings
-from config.internal.internal_config import config
+from config.merchant_config import get_config as get_settings
 
 router = APIRouter(prefix="/doordash", tags=["DoorDash"])
 
+
+def send_or_enqueue(operation: str, method: str, url: str, payload: Optional[Dict[str, Any]],
+                    external_delivery_id: Optional[str], prefer: Optional[str]):
+    """
+    Send a DoorDash write now, or hand it to the outbox and answer 202 with a tracking id:
+    - when the client sends `Prefer: respond-async`
+    - when earlier writes for the same delivery are still queued, so they keep their order
+    - when DoorDash is unavailable (timeouts, 429, 5xx)
+    """
+    sent = dict(payload) if payload is not None else None
+    if operation == "create_delivery" and sent is not None:
+        # fixed once, so every retry of this create reaches DoorDash under the same id
+        assign_external_delivery_id(sent)
+        external_delivery_id = sent.get("external_delivery_id")
+
+    if prefer and "respond-async" in prefer:
+        return accepted(outbox.enqueue(operation, method, url, sent, external_delivery_id), external_delivery_id)
+
+    if operation != "create_delivery" and external_delivery_id and outbox.has_pending(external_delivery_id):
+        logger.info(f"Earlier writes for delivery {external_delivery_id} are queued, queueing {operation} behind them")
+        return accepted(outbox.enqueue(operation, method, url, sent, external_delivery_id), external_delivery_id)
+
+    try:
+        response = doordash_request(method=method, url=url, json_data=sent, assign_id=False)
+    except HTTPException as e:
+        if not outbox.is_retryable(e.status_code):
+            raise
+        logger.error(f"DoorDash unavailable ({e.status_code}), queueing {operation} in outbox")
+        return accepted(outbox.enqueue(operation, method, url, sent, external_delivery_id, attempts=1), external_delivery_id)
+
+    if operation == "create_delivery" and response and sent is not None:
+        logger.info("Response received")
+        outbox.record_delivery(sent)
+    return {"data": response}
+
+
+def accepted(tracking_id: str, external_delivery_id: Optional[str]) -> JSONResponse:
+    # for a create this is the server-assigned id, needed to update, cancel or stream it
+    return JSONResponse(
+        status_code=202,
+        content={"data": {"tracking_id": tracking_id, "external_delivery_id": external_delivery_id, "status": "pending"}},
+        headers={"Location": f"{router.prefix}/outbox/{tracking_id}"},
+    )
+
+
 @router.post("/create_quote", response_model=DoorDashResponse)
 async def create_quote(data: CreateQuoteRequest = Body(...)):
     """
@@ -78,40 +122,21 @@ async def accept_quote(data: AcceptQuoteRequest = Body(...)):
 
 
 @router.post("/create_delivery", response_model=DoorDashResponse)
-async def create_delivery(data: CreateDeliveryRequest = Body(...)):
+async def create_delivery(data: CreateDeliveryRequest = Body(...), prefer: Optional[str] = Header(None)):
     """
     Create a delivery directly without going through quote flow.
+
+    Answers 202 with an outbox tracking_id when sent with `Prefer: respond-async`
+    or while DoorDash is unavailable.
     """
-    response = doordash_request(
+    return send_or_enqueue(
+        "create_delivery",
         method="POST",
         url="https://openapi.doordash.com/drive/v2/deliveries",
-        json_data=data.model_dump(exclude_unset=True),
+        payload=data.model_dump(exclude_unset=True),
+        external_delivery_id=data.external_delivery_id,
+        prefer=prefer,
     )
-    try:
-        if response:
-            logger.info("Response received")
-            conn = None
-            try:
-                conn = psycopg.connect(f"host=postgresql port=5432 dbname=doordash user=doordash password={config.DOORDASH_DB_PW} connect_timeout=10")
-                with conn.cursor() as cur:
-                    cur.execute(
-                        "INSERT INTO deliveries (store_id, order_data, dropoff_address, dropoff_phone) VALUES (%s, %s, %s, %s)",
-                        (1, Jsonb(data.model_dump_json()), data.dropoff_address, data.dropoff_phone_number)
-                    )
-                    conn.commit()
-                    logger.info("Request logged to PostgreSQL successfully")
-            except Exception as db_error:
-                if conn is not None:
-                    conn.rollback()
-                logger.error(f"Failed to log request to PostgreSQL: {str(db_error)}")
-                raise
-            finally:
-                if conn is not None:
-                    conn.close()
-    except Exception as e:
-        logger.error(f"Error in database operation: {str(e)}")
-        raise
-    return {"data": response}
 
 
 @router.post("/get_delivery_request", response_model=DoorDashResponse)
@@ -130,6 +155,7 @@ async def update_store(data: UpdateStoreRequest):
     Update fields of an existing store.
     """
     payload = data.model_dump(exclude={"external_business_id", "external_store_id"}, exclude_unset=True)
+    settings = get_settings()
     response = doordash_request(
         method="PATCH",
         url=f"https://openapi.doordash.com/developer/v1/businesses/{settings.PICKUP_EXTERNAL_BUSINESS_ID}/stores/{settings.PICKUP_EXTERNAL_STORE_ID}",
@@ -139,30 +165,53 @@ async def update_store(data: UpdateStoreRequest):
 
 
 @router.patch("/update_delivery", response_model=DoorDashResponse)
-async def update_delivery(data: UpdateDeliveryRequest = Body(...)):
+async def update_delivery(data: UpdateDeliveryRequest = Body(...), prefer: Optional[str] = Header(None)):
     """
     Update fields of an existing delivery.
+
+    Answers 202 with an outbox tracking_id when sent with `Prefer: respond-async`
+    or while DoorDash is unavailable.
     """
     external_id = data.external_delivery_id
     payload = data.model_dump(exclude={"external_delivery_id"}, exclude_unset=True)
-    response = doordash_request(
+    return send_or_enqueue(
+        "update_delivery",
         method="PATCH",
         url=f"https://openapi.doordash.com/drive/v2/deliveries/{external_id}",
-        json_data=payload,
+        payload=payload,
+        external_delivery_id=external_id,
+        prefer=prefer,
     )
-    return {"data": response}
 
 
 @router.put("/cancel_delivery", response_model=DoorDashResponse)
-async def cancel_delivery(data: CancelDeliveryRequest = Body(...)):
+async def cancel_delivery(data: CancelDeliveryRequest = Body(...), prefer: Optional[str] = Header(None)):
     """
     Cancel a delivery.
+
+    Answers 202 with an outbox tracking_id when sent with `Prefer: respond-async`
+    or while DoorDash is unavailable.
     """
-    response = doordash_request(
+    return send_or_enqueue(
+        "cancel_delivery",
         method="PUT",
         url=f"https://openapi.doordash.com/drive/v2/deliveries/{data.external_delivery_id}/cancel",
+        payload=None,
+        external_delivery_id=data.external_delivery_id,
+        prefer=prefer,
     )
-    return {"data": response}
+
+
+@router.get("/outbox/{tracking_id}", response_model=DoorDashResponse)
+async def get_outbox_entry(tracking_id: str):
+    """
+    Status of a write accepted with 202: pending, sent (with the DoorDash response),
+    failed (with the last error) or spooled (waiting for the database).
+    """
+    entry = outbox.lookup(tracking_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Unknown tracking_id")
+    return {"data": entry}
 
 
 @router.get("/list_businesses", response_model=DoorDashResponse)
@@ -0,0 +1,65 @@
+import asyncio
+import json
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Header, Request
+from fastapi.responses import StreamingResponse
+from fast_api_server.services.broadcaster import broadcaster, recent_updates
+
+router = APIRouter(prefix="/stream", tags=["DoorDash Stream"])
+
+# Comment line sent when idle so proxies keep the connection open
+KEEPALIVE_SECONDS = 15
+
+
+def sse(update: Dict[str, Any]) -> str:
+    # updates published without a logged event (database down) carry no id
+    event_id = update.get("event_id")
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: delivery_status\ndata: {json.dumps(update, default=str)}\n\n"
+
+
+@router.get("/deliveries")
+async def stream_deliveries(
+    request: Request,
+    store_id: Optional[int] = None,
+    external_delivery_id: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-Sent Events stream of delivery status updates received on /webhooks/doordash.
+
+    - Filter by store_id and/or external_delivery_id; no filter streams every update
+    - Each update is sent as a `delivery_status` event with a JSON body and its events.id as `id:`
+    - Starts with the latest status of each recent delivery, or - when reconnecting
+      with `Last-Event-ID` - every update logged since that id
+    - A client which falls behind loses its oldest buffered updates
+    """
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    # subscribe before reading history so nothing logged in between is missed
+    subscription = broadcaster.subscribe(store_id, external_delivery_id)
+
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            backlog = await asyncio.to_thread(recent_updates, store_id, external_delivery_id, after)
+            for update in backlog:
+                yield sse(update)
+            # live updates which the backlog already covered
+            sent_ids = {update["event_id"] for update in backlog}
+            while not await request.is_disconnected():
+                try:
+                    update = await asyncio.wait_for(subscription.queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if update.get("event_id") in sent_ids:
+                    continue
+                yield sse(update)
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
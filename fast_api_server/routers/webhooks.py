@@ -1,20 +1,19 @@
 import base64
-import psycopg
-from psycopg.sql import Composed
-from psycopg.types.json import Jsonb
+from typing import TYPE_CHECKING
 from fastapi import APIRouter, Request, HTTPException, Header
 from fastapi.responses import JSONResponse
 from fastapi import Depends
-from config.internal.internal_config import config
+from config.internal.internal_config import get_config
 from core.utils import add_query_field, insert_query, Ref
 from core.logging.logger import logger
+from fast_api_server.services.broadcaster import broadcaster, notify, status_update
+from fast_api_server.services.schema import connect
 
+if TYPE_CHECKING:
+    from psycopg.sql import Composed
 
 router = APIRouter(prefix="/webhooks", tags=["DoorDash Webhooks"])
 
-WEBHOOK_USER = config.DOORDASH_WEBHOOK_ID
-WEBHOOK_PASS = config.DOORDASH_WEBHOOK_SECRET
-
 def verify_basic_auth(authorization: str | None = Header(None)):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Unauthorized")
@@ -22,7 +21,8 @@ def verify_basic_auth(authorization: str | None = Header(None)):
     decoded = base64.b64decode(encoded).decode()
     username, password = decoded.split(":")
 
-    if username != WEBHOOK_USER or password != WEBHOOK_PASS:
+    config = get_config()
+    if username != config.DOORDASH_WEBHOOK_ID or password != config.DOORDASH_WEBHOOK_SECRET:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     return True
 
@@ -33,13 +33,15 @@ async def doordash_webhook(
 ):
     if _auth is None:
         raise HTTPException(status_code=401, detail="Missing Authorization header")
+    from psycopg.types.json import Jsonb
+
     payload = await request.json()
     conn = None
     fields : Ref[Composed | None ]= Ref(None)
     field_values = []
     new_delivery_id : int | None = payload.get("external_delivery_id")
     try:
-        conn = psycopg.connect(f"host=postgresql port=5432 dbname=doordash user=doordash password={config.DOORDASH_DB_PW} connect_timeout=10")
+        conn = connect()
         with conn.cursor() as cur:
             field_values.append(add_query_field("status_code", {}, fields, 200))
             field_values.append(add_query_field("store_id",{}, fields, 1))
@@ -61,7 +63,9 @@ async def doordash_webhook(
                 field_values.append(add_query_field("delivery_id", {}, fields, new_delivery_id))
             field_values.append(add_query_field("message", {}, fields, Jsonb(payload)))
             if fields.value:
-                cur.execute(insert_query('events', fields.value, field_values))
+                event_id = cur.execute(insert_query('events', fields.value, field_values)).fetchone()
+                # delivered to every worker's stream subscribers on commit
+                notify(cur, status_update(payload, 1, new_delivery_id, event_id[0] if event_id else None))
                 conn.commit()
                 logger.info("Request logged to PostgreSQL events successfully")
 
@@ -69,6 +73,8 @@ async def doordash_webhook(
         if conn is not None:
             conn.rollback()
         logger.info(f"Failed to log request to PostgreSQL: {str(db_error)}")
+        # no NOTIFY went out - reach at least this worker's subscribers
+        broadcaster.publish(status_update(payload, 1))
         return JSONResponse({"status": "ok"})
         #raise
     finally:
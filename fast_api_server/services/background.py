@@ -0,0 +1,48 @@
+import asyncio
+from typing import Optional
+from core.logging.logger import logger
+
+
+class BackgroundTask:
+    """
+    An asyncio task started from the app lifespan and cancelled on shutdown.
+
+    By default `run` calls `run_once` every `interval()` seconds, logging and
+    swallowing errors so one failed pass doesn't end the task.
+    """
+
+    name = "Background task"
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+            logger.info(f"{self.name} started")
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+            logger.info(f"{self.name} stopped")
+
+    async def run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{self.name} pass failed: {str(e)}")
+            await asyncio.sleep(self.interval())
+
+    async def run_once(self):
+        raise NotImplementedError
+
+    def interval(self) -> float:
+        raise NotImplementedError
@@ -0,0 +1,182 @@
+import asyncio
+import json
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+from config.internal.internal_config import get_config
+from core.logging.logger import logger
+from fast_api_server.services.background import BackgroundTask
+from fast_api_server.services.schema import async_connect, connect, ensure_schema
+
+if TYPE_CHECKING:
+    import psycopg
+
+# Postgres channel used to fan delivery updates out to every worker
+NOTIFY_CHANNEL = "delivery_updates"
+
+# Most events replayed to a reconnecting stream client
+REPLAY_LIMIT = 1000
+
+# Optional filters shared by the replay and snapshot queries
+STREAM_FILTERS = """
+      AND (%(store_id)s::integer IS NULL OR e.store_id = %(store_id)s)
+      AND (%(external_delivery_id)s::text IS NULL OR d.order_data->>'external_delivery_id' = %(external_delivery_id)s)
+"""
+
+# Delivery events logged after the client's Last-Event-ID
+REPLAY_QUERY = """
+    SELECT e.id, e.store_id, e.delivery_id, e.message
+    FROM events e
+    JOIN deliveries d ON d.id = e.delivery_id
+    WHERE e.id > %(after)s
+""" + STREAM_FILTERS + """
+    ORDER BY e.id
+    LIMIT %(limit)s;
+"""
+
+# Latest event of each recent delivery, for a client connecting for the first time
+SNAPSHOT_QUERY = """
+    SELECT id, store_id, delivery_id, message
+    FROM (
+        SELECT DISTINCT ON (e.delivery_id) e.id, e.store_id, e.delivery_id, e.message
+        FROM events e
+        JOIN deliveries d ON d.id = e.delivery_id
+        WHERE d.created_at > now() - make_interval(hours => %(hours)s)
+""" + STREAM_FILTERS + """
+        ORDER BY e.delivery_id, e.id DESC
+    ) latest
+    ORDER BY id
+    LIMIT %(limit)s;
+"""
+
+
+def status_update(payload: Dict[str, Any], store_id: int, delivery_id: Optional[int] = None,
+                  event_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Slim, NOTIFY-sized view of a webhook payload or delivery response
+    (pg_notify payloads are limited to 8000 bytes). event_id is the logged
+    events row, used as the SSE id so clients can resume after it.
+    """
+    return {
+        "event_id": event_id,
+        "store_id": store_id,
+        "delivery_id": delivery_id,
+        "external_delivery_id": payload.get("external_delivery_id"),
+        "delivery_status": payload.get("delivery_status"),
+        "event_name": payload.get("event_name"),
+        "dasher_name": payload.get("dasher_name"),
+        "dasher_location": payload.get("dasher_location"),
+        "pickup_time_estimated": payload.get("pickup_time_estimated"),
+        "dropoff_time_estimated": payload.get("dropoff_time_estimated"),
+        "tracking_url": payload.get("tracking_url"),
+        "created": payload.get("created_at"),
+    }
+
+
+def notify(cur: "psycopg.Cursor", update: Dict[str, Any]):
+    """Queue a NOTIFY on the caller's transaction; it is delivered when the transaction commits"""
+    cur.execute("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, json.dumps(update, default=str)))
+
+
+def recent_updates(store_id: Optional[int], external_delivery_id: Optional[str],
+                   after: Optional[int]) -> List[Dict[str, Any]]:
+    """
+    Updates a stream client has not seen: events logged after `after` (its
+    Last-Event-ID), or the latest status of each recent delivery when connecting fresh
+    """
+    import psycopg
+
+    params = {
+        "store_id": store_id,
+        "external_delivery_id": external_delivery_id,
+        "after": after,
+        "hours": get_config().DOORDASH_STREAM_SNAPSHOT_HOURS,
+        "limit": REPLAY_LIMIT,
+    }
+    if not ensure_schema():
+        return []
+    try:
+        with connect() as conn:
+            rows = conn.execute(SNAPSHOT_QUERY if after is None else REPLAY_QUERY, params).fetchall()
+    except psycopg.Error as db_error:
+        logger.error(f"Failed to read recent delivery events from PostgreSQL: {str(db_error)}")
+        return []
+    return [status_update(message, row_store_id, delivery_id, event_id)
+            for event_id, row_store_id, delivery_id, message in rows if isinstance(message, dict)]
+
+
+class Subscription:
+    def __init__(self, store_id: Optional[int], external_delivery_id: Optional[str], maxsize: int):
+        self.store_id = store_id
+        self.external_delivery_id = external_delivery_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def matches(self, update: Dict[str, Any]) -> bool:
+        if self.store_id is not None and update.get("store_id") != self.store_id:
+            return False
+        if self.external_delivery_id is not None and update.get("external_delivery_id") != self.external_delivery_id:
+            return False
+        return True
+
+    def offer(self, update: Dict[str, Any]):
+        """Enqueue without blocking; a slow client loses its oldest updates, never the publisher's time"""
+        while True:
+            try:
+                self.queue.put_nowait(update)
+                return
+            except asyncio.QueueFull:
+                self.queue.get_nowait()
+                self.dropped += 1
+
+
+class DeliveryBroadcaster(BackgroundTask):
+    """
+    In-process fan-out of delivery status updates to stream subscribers.
+
+    Updates are published to Postgres with NOTIFY by whichever worker receives
+    them; every worker LISTENs and forwards notifications to its own subscribers.
+    """
+
+    name = "Delivery broadcaster"
+
+    def __init__(self):
+        super().__init__()
+        self.subscribers: Set[Subscription] = set()
+
+    def subscribe(self, store_id: Optional[int] = None, external_delivery_id: Optional[str] = None) -> Subscription:
+        subscription = Subscription(store_id, external_delivery_id, get_config().DOORDASH_STREAM_QUEUE_SIZE)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+        if subscription.dropped:
+            logger.info(f"Stream subscriber dropped {subscription.dropped} updates (queue full)")
+
+    def publish(self, update: Dict[str, Any]):
+        for subscription in list(self.subscribers):
+            if subscription.matches(update):
+                subscription.offer(update)
+
+    async def run(self):
+        """LISTEN for the whole worker lifetime, reconnecting with backoff"""
+        backoff = 1
+        while True:
+            try:
+                async with await async_connect(autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    logger.info(f"Listening on PostgreSQL channel {NOTIFY_CHANNEL}")
+                    backoff = 1
+                    async for notification in conn.notifies():
+                        try:
+                            self.publish(json.loads(notification.payload))
+                        except ValueError:
+                            logger.error(f"Invalid {NOTIFY_CHANNEL} payload: {notification.payload}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"PostgreSQL LISTEN failed, retrying in {backoff}s: {str(e)}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+
+broadcaster = DeliveryBroadcaster()
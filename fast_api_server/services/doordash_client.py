@@ -1,22 +1,22 @@
-
-import logging
-import sys
 import base64
 import time
-import jwt
-import requests
-import psycopg
-from psycopg.types.json import Jsonb
-from typing import List, Optional, Dict, Any
+from typing import TYPE_CHECKING, Optional, Dict, Any, Tuple
 from fastapi import HTTPException
 from core.utils import add_query_field, insert_query, Ref
-from psycopg import sql
-from psycopg.sql import Composed
-from config.internal.internal_config import config
+from config.internal.internal_config import get_config
 from core.logging.logger import logger
+from fast_api_server.services.schema import connect, ensure_schema
+
+if TYPE_CHECKING:
+    from psycopg.sql import Composed
+
+# jwt, requests and psycopg are imported on first use to keep worker start-up fast
 
 def generate_jwt_token() -> str:
     """Generate a short-lived JWT for DoorDash API authentication (5-minute expiry)"""
+    import jwt
+
+    config = get_config()
     issued_at = int(time.time())
     payload = {
         "aud": "doordash",
@@ -47,8 +47,41 @@ def generate_jwt_token() -> str:
     return token
 
 
-def doordash_request(method: str, url: str, json_data: Optional[Dict] = None) -> Dict[str, Any]:
-    """Centralized request handler with JWT auth and PostgreSQL logging"""
+def assign_external_delivery_id(json_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Set json_data["external_delivery_id"] to the next `YYYY-MM-DD - <n>` id, reserved
+    from a sequence so queued deliveries never share one. Keeps the caller's id
+    if PostgreSQL is unavailable.
+    """
+    import psycopg
+
+    if not ensure_schema():
+        logger.error("PostgreSQL unavailable, keeping the caller's external_delivery_id")
+        return json_data
+    try:
+        with connect() as conn:
+            with conn.cursor() as cur:
+                value = cur.execute("SELECT nextval('external_delivery_id_seq')").fetchone()
+                conn.commit()
+                if value:
+                    json_data["external_delivery_id"] = time.strftime("%Y-%m-%d") + " - " + str(value[0])
+    except psycopg.Error as db_error:
+        # a database outage should not stop the DoorDash call - keep the caller's id
+        logger.error(f"Failed to assign external_delivery_id from PostgreSQL: {str(db_error)}")
+    return json_data
+
+
+def doordash_request(method: str, url: str, json_data: Optional[Dict] = None, assign_id: bool = True) -> Dict[str, Any]:
+    """
+    Centralized request handler with JWT auth and PostgreSQL logging
+
+    assign_id=False sends json_data as is, for writes whose external_delivery_id
+    was fixed before the first attempt (see send_or_enqueue / outbox)
+    """
+    import requests
+    from psycopg.types.json import Jsonb
+
+    config = get_config()
     token = generate_jwt_token()
     headers = {
         "Authorization": f"Bearer {token}",
@@ -62,21 +95,14 @@ def doordash_request(method: str, url: str, json_data: Optional[Dict] = None) ->
 
     try:
         if json_data:
-            with psycopg.connect(f"host=postgresql port=5432 dbname=doordash user=doordash password={config.DOORDASH_DB_PW} connect_timeout=10") as conn:
-                with conn.cursor() as cur:
-                    value = cur.execute("SELECT max(id) as delivery_id FROM deliveries").fetchone()
-                    conn.commit()
-                    if value:
-                        json_data["external_delivery_id"] = time.strftime("%Y-%m-%d") + " - " + str(value[0] + 1) if value[0] else "*error*"
-                    response = requests.request(method, url, json=json_data, headers=headers, timeout=30)
-                    response.raise_for_status()
-                    response_data = response.json()
-                    status_code = response.status_code
+            if assign_id:
+                assign_external_delivery_id(json_data)
+            response = requests.request(method, url, json=json_data, headers=headers, timeout=30)
         else:
             response = requests.request(method, url, headers=headers, timeout=30)
-            response.raise_for_status()
-            response_data = response.json()
-            status_code = response.status_code
+        response.raise_for_status()
+        response_data = response.json()
+        status_code = response.status_code
     except requests.HTTPError as e:
         status_code = getattr(e.response, "status_code", status_code)
         try:
@@ -91,36 +117,12 @@ def doordash_request(method: str, url: str, json_data: Optional[Dict] = None) ->
         conn = None
         fields : Ref[Composed | None ]= Ref(None)
         try:
-            conn = psycopg.connect(f"host=postgresql port=5432 dbname=doordash user=doordash password={config.DOORDASH_DB_PW} connect_timeout=10")
+            conn = connect()
             with conn.cursor() as cur:
                 field_values = []
-                new_delivery_id : int | None = None
-                # Log Delivery if applicable
-                if json_data and json_data.get("external_delivery_id") and json_data.get("delivery_status"):
-                    if json_data.get("delivery_status") == "created" or json_data.get("delivery_status") == "quote":
-                        fields  = Ref(None)
-                        field_values.clear()
-                        field_values.append(add_query_field("store_id", {}, fields, 1))
-                        field_values.append(add_query_field("order_data", {}, fields, Jsonb(json_data)))
-                        field_values.append(add_query_field("dropoff_address", json_data, fields, None))
-                        field_values.append(add_query_field("dropoff_phone", {}, fields, json_data["dropoff_phone_number"]))
-                        if fields.value:
-                            cur.execute(insert_query('deliveries', fields.value, field_values))
-                                # "INSERT INTO <table(s) () VALUES () Returning id",
-                                # eg. (1, Jsonb(json_data), dropoff_address, dropoff_phone)
-                            conn.commit()
-                            res = cur.fetchone()#
-                            if res: 
-                                res = res[0]
-                                new_delivery_id = int(res)
-                            logger.info("Request logged to PostgreSQL deliveries successfully")
                 # Log Event(s) - #ticket: id13
-                fields  = Ref(None)
-                field_values.clear()
                 field_values.append(add_query_field("status_code", {}, fields, status_code))
                 field_values.append(add_query_field("store_id",{}, fields, 1))
-                if new_delivery_id:
-                    field_values.append(add_query_field("delivery_id", {}, fields, new_delivery_id))
                 if status_code != 200:
                     field_values.append(add_query_field("message", {}, fields, Jsonb(error_detail)))
                 else:
@@ -132,8 +134,8 @@ def doordash_request(method: str, url: str, json_data: Optional[Dict] = None) ->
         except Exception as db_error:
             if conn is not None:
                 conn.rollback()
+            # logging is best-effort: never mask the DoorDash result with a database error
             logger.error(f"Failed to log request to PostgreSQL: {str(db_error)}")
-            raise
         finally:
             if conn is not None:
                 logger.info("Closing PostfreSQL connection")
@@ -143,4 +145,24 @@ def doordash_request(method: str, url: str, json_data: Optional[Dict] = None) ->
     if error_detail:
         raise HTTPException(status_code=status_code, detail=error_detail)
 
-    return response_data
\ No newline at end of file
+    return response_data
+
+
+def fetch_delivery(external_delivery_id: str) -> Tuple[int, Dict[str, Any]]:
+    """Fetch a delivery from DoorDash without the per-request event logging of doordash_request"""
+    import requests
+
+    headers = {
+        "Authorization": f"Bearer {generate_jwt_token()}",
+        "Content-Type": "application/json",
+    }
+    response = requests.get(
+        f"https://openapi.doordash.com/drive/v2/deliveries/{external_delivery_id}",
+        headers=headers,
+        timeout=30,
+    )
+    try:
+        data = response.json()
+    except ValueError:
+        data = {"error": response.text}
+    return response.status_code, data
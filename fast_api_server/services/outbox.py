@@ -0,0 +1,398 @@
+import asyncio
+import glob
+import json
+import os
+import re
+import time
+import uuid
+from typing import Any, Dict, Optional
+from fastapi import HTTPException
+from config.internal.internal_config import get_config
+from core.logging.logger import logger
+from fast_api_server.services.doordash_client import doordash_request, fetch_delivery
+from fast_api_server.services.background import BackgroundTask
+from fast_api_server.services.schema import connect, ensure_schema
+
+# DoorDash / transport failures worth retrying; anything else is the request's fault
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Oldest due entry per delivery only, so updates and cancels for one delivery
+# are sent in the order they were accepted
+CLAIM_QUERY = """
+    SELECT id, tracking_id, operation, method, url, payload, attempts
+    FROM outbox o
+    WHERE status = 'pending'
+      AND next_attempt_at <= now()
+      AND NOT EXISTS (
+          SELECT 1
+          FROM outbox earlier
+          WHERE earlier.status = 'pending'
+            AND earlier.external_delivery_id = o.external_delivery_id
+            AND earlier.id < o.id
+      )
+    ORDER BY id
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED;
+"""
+
+# Spool-only entry: a delivery created at DoorDash whose `deliveries` row could not be
+# written; the dispatcher inserts it once PostgreSQL is back
+RECORD_OPERATION = "record_delivery"
+
+# Idempotent, so a record drained twice from the spool is only inserted once
+RECORD_QUERY = """
+    INSERT INTO deliveries (store_id, order_data, dropoff_address, dropoff_phone)
+    SELECT %s, %s, %s, %s
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM deliveries
+        WHERE order_data->>'external_delivery_id' = %s
+    );
+"""
+
+PENDING_QUERY = """
+    SELECT 1
+    FROM outbox
+    WHERE status = 'pending'
+      AND external_delivery_id = %s
+    LIMIT 1;
+"""
+
+INSERT_QUERY = """
+    INSERT INTO outbox (tracking_id, operation, external_delivery_id, method, url, payload, attempts)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (tracking_id) DO NOTHING;
+"""
+
+
+def is_retryable(status_code: int) -> bool:
+    return status_code in RETRYABLE_STATUS_CODES
+
+
+def already_created(operation: str, status_code: int, attempts: int) -> bool:
+    """A 409 on a retried create means an earlier attempt reached DoorDash under the same id"""
+    return operation == "create_delivery" and status_code == 409 and attempts > 1
+
+
+def same_delivery(sent: Dict[str, Any], existing: Dict[str, Any]) -> bool:
+    """Whether the delivery DoorDash holds under our external_delivery_id has our dropoff"""
+    def phone(value) -> str:
+        return re.sub(r"\D", "", str(value or ""))[-10:]
+
+    def address(value) -> str:
+        return re.sub(r"[^a-z0-9]", "", str(value or "").lower())
+
+    if phone(sent.get("dropoff_phone_number")) != phone(existing.get("dropoff_phone_number")):
+        return False
+    ours, theirs = address(sent.get("dropoff_address")), address(existing.get("dropoff_address"))
+    # DoorDash may reformat the address it was given, e.g. append the country
+    return bool(ours) and bool(theirs) and (ours in theirs or theirs in ours)
+
+
+def retry_delay(attempts: int) -> int:
+    """Exponential backoff in seconds: 10s, 20s, 40s ... capped at 15 minutes"""
+    return min(5 * 2 ** attempts, 900)
+
+
+def insert_entry(cur, entry: Dict[str, Any]):
+    from psycopg.types.json import Jsonb
+
+    cur.execute(INSERT_QUERY, (
+        entry["tracking_id"], entry["operation"], entry["external_delivery_id"],
+        entry["method"], entry["url"], Jsonb(entry["payload"]) if entry["payload"] is not None else None,
+        entry.get("attempts", 0),
+    ))
+
+
+def insert_delivery(cur, order_data: Dict[str, Any]):
+    from psycopg.types.json import Jsonb
+
+    cur.execute(RECORD_QUERY, (
+        1, Jsonb(order_data), order_data.get("dropoff_address"), order_data.get("dropoff_phone_number"),
+        order_data.get("external_delivery_id"),
+    ))
+
+
+def spooled_files(directory: str):
+    if not os.path.isdir(directory):
+        return []
+    # names start with time_ns(), so sorting gives arrival order
+    return sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+
+
+def spool_entry(entry: Dict[str, Any]):
+    """Write an entry to the local spool; it is moved into PostgreSQL by the dispatcher"""
+    directory = get_config().DOORDASH_OUTBOX_SPOOL_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = f"{time.time_ns()}-{entry['tracking_id']}.json"
+    tmp_path = os.path.join(directory, name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(entry, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(directory, name))
+    logger.info(f"Outbox entry {entry['tracking_id']} spooled to {directory}")
+
+
+def spooled_for(directory: str, external_delivery_id: str) -> bool:
+    for name in spooled_files(directory):
+        try:
+            with open(os.path.join(directory, name)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            # moved into PostgreSQL by the dispatcher while we were listing
+            continue
+        if entry.get("operation") != RECORD_OPERATION and entry.get("external_delivery_id") == external_delivery_id:
+            return True
+    return False
+
+
+def has_pending(external_delivery_id: str) -> bool:
+    """
+    Whether earlier writes for this delivery are still queued, in PostgreSQL or the
+    spool. Answers True when PostgreSQL can't be checked, so a direct call never
+    overtakes a queued one.
+    """
+    import psycopg
+
+    if spooled_for(get_config().DOORDASH_OUTBOX_SPOOL_DIR, external_delivery_id):
+        return True
+    if not ensure_schema():
+        return True
+    try:
+        with connect() as conn:
+            return conn.execute(PENDING_QUERY, (external_delivery_id,)).fetchone() is not None
+    except psycopg.Error as db_error:
+        logger.error(f"Failed to check outbox for pending entries: {str(db_error)}")
+        return True
+
+
+def record_delivery(order_data: Dict[str, Any]):
+    """
+    Insert a created delivery into `deliveries`, as sent to DoorDash (including
+    the assigned external_delivery_id) so webhooks and the reconciler can find it.
+    Spooled if PostgreSQL is unavailable: the delivery exists at DoorDash either way.
+    """
+    import psycopg
+
+    try:
+        with connect() as conn:
+            with conn.cursor() as cur:
+                insert_delivery(cur, order_data)
+                conn.commit()
+                logger.info("Request logged to PostgreSQL successfully")
+        return
+    except psycopg.Error as db_error:
+        logger.error(f"Failed to log delivery to PostgreSQL, spooling locally: {str(db_error)}")
+    try:
+        spool_entry({
+            "tracking_id": str(uuid.uuid4()),
+            "operation": RECORD_OPERATION,
+            "external_delivery_id": order_data.get("external_delivery_id"),
+            "method": None,
+            "url": None,
+            "payload": order_data,
+        })
+    except OSError as spool_error:
+        logger.error(f"Failed to spool delivery record: {str(spool_error)}")
+
+
+def enqueue(operation: str, method: str, url: str, payload: Optional[Dict[str, Any]],
+            external_delivery_id: Optional[str], attempts: int = 0) -> str:
+    """
+    Record a DoorDash write for the dispatcher to send; returns its tracking id.
+
+    The payload is sent exactly as given, so a create must already carry its
+    final external_delivery_id. `attempts` counts sends already made by the caller.
+    Stored in PostgreSQL, or in the local spool if the database is down (or
+    earlier entries are still spooled, so per-delivery order is kept).
+    """
+    import psycopg
+
+    config = get_config()
+    entry = {
+        "tracking_id": str(uuid.uuid4()),
+        "operation": operation,
+        "external_delivery_id": external_delivery_id,
+        "method": method,
+        "url": url,
+        "payload": payload,
+        "attempts": attempts,
+    }
+    try:
+        if spooled_files(config.DOORDASH_OUTBOX_SPOOL_DIR):
+            spool_entry(entry)
+            return entry["tracking_id"]
+        try:
+            with connect() as conn:
+                with conn.cursor() as cur:
+                    insert_entry(cur, entry)
+                    conn.commit()
+                    logger.info(f"Outbox entry {entry['tracking_id']} logged to PostgreSQL successfully")
+        except psycopg.Error as db_error:
+            logger.error(f"Failed to log outbox entry to PostgreSQL, spooling locally: {str(db_error)}")
+            spool_entry(entry)
+    except OSError as spool_error:
+        logger.error(f"Failed to spool outbox entry: {str(spool_error)}")
+        raise HTTPException(status_code=503, detail={"error": "DoorDash and storage unavailable, request not accepted"})
+    return entry["tracking_id"]
+
+
+def lookup(tracking_id: str) -> Optional[Dict[str, Any]]:
+    """Current state of an outbox entry, or None if the tracking id is unknown"""
+    import psycopg
+
+    try:
+        tracking_id = str(uuid.UUID(tracking_id))
+    except ValueError:
+        return None
+
+    config = get_config()
+    try:
+        with connect() as conn:
+            with conn.cursor() as cur:
+                row = cur.execute(
+                    """
+                    SELECT operation, external_delivery_id, status, attempts, last_error, response, created_at, updated_at
+                    FROM outbox
+                    WHERE tracking_id = %s;
+                    """,
+                    (tracking_id,)
+                ).fetchone()
+        if row:
+            operation, external_delivery_id, status, attempts, last_error, response, created_at, updated_at = row
+            return {
+                "tracking_id": tracking_id,
+                "operation": operation,
+                "external_delivery_id": external_delivery_id,
+                "status": status,
+                "attempts": attempts,
+                "last_error": last_error,
+                "response": response,
+                "created_at": created_at.isoformat(),
+                "updated_at": updated_at.isoformat(),
+            }
+    except psycopg.Error as db_error:
+        logger.error(f"Failed to read outbox entry from PostgreSQL: {str(db_error)}")
+
+    if glob.glob(os.path.join(config.DOORDASH_OUTBOX_SPOOL_DIR, f"*-{tracking_id}.json")):
+        return {"tracking_id": tracking_id, "status": "spooled"}
+    return None
+
+
+class OutboxDispatcher(BackgroundTask):
+    """
+    Background task which moves spooled entries into PostgreSQL, then sends due
+    outbox entries to DoorDash with retries. Each claimed row stays locked until its
+    result is committed, so several workers can dispatch without sending twice.
+    """
+
+    name = "Outbox dispatcher"
+
+    def interval(self) -> float:
+        return get_config().DOORDASH_OUTBOX_POLL_SECONDS
+
+    async def run_once(self):
+        await asyncio.to_thread(self.dispatch_once)
+
+    def dispatch_once(self) -> int:
+        """Run one pass; returns the number of entries attempted"""
+        # the outbox table may not exist yet on a database created before it
+        if not ensure_schema():
+            return 0
+        config = get_config()
+        with connect() as conn:
+            self.drain_spool(conn, config.DOORDASH_OUTBOX_SPOOL_DIR)
+            attempted = 0
+            while attempted < config.DOORDASH_OUTBOX_BATCH_SIZE:
+                # one entry per transaction: its result is committed right after
+                # its DoorDash call, so a crash re-sends at most that one entry
+                with conn.cursor() as cur:
+                    row = cur.execute(CLAIM_QUERY).fetchone()
+                    if row is None:
+                        conn.commit()
+                        break
+                    self.send(cur, *row, max_attempts=config.DOORDASH_OUTBOX_MAX_ATTEMPTS)
+                    conn.commit()
+                attempted += 1
+        return attempted
+
+    @staticmethod
+    def drain_spool(conn, directory: str):
+        for name in spooled_files(directory):
+            path = os.path.join(directory, name)
+            with open(path) as f:
+                entry = json.load(f)
+            with conn.cursor() as cur:
+                if entry["operation"] == RECORD_OPERATION:
+                    insert_delivery(cur, entry["payload"])
+                else:
+                    insert_entry(cur, entry)
+                conn.commit()
+            # ON CONFLICT / NOT EXISTS makes a crash between commit and remove harmless
+            os.remove(path)
+            logger.info(f"Outbox entry {entry['tracking_id']} moved from spool to PostgreSQL")
+
+    @staticmethod
+    def send(cur, entry_id: int, tracking_id, operation: str, method: str, url: str,
+             payload: Optional[Dict[str, Any]], attempts: int, max_attempts: int):
+        import requests
+        from psycopg.types.json import Jsonb
+
+        attempts += 1
+        sent = dict(payload) if payload is not None else None
+        try:
+            response = doordash_request(method=method, url=url, json_data=sent, assign_id=False)
+        except Exception as e:
+            status_code = e.status_code if isinstance(e, HTTPException) else 500
+            detail = e.detail if isinstance(e, HTTPException) else {"error": str(e)}
+            if not already_created(operation, status_code, attempts):
+                OutboxDispatcher.record_failure(cur, entry_id, tracking_id, operation, attempts, max_attempts, status_code, detail)
+                return
+            # an earlier attempt may have created it before failing (timeout, 502, unreadable
+            # body) - or the id, kept from the caller while PostgreSQL was down, is someone else's
+            try:
+                lookup_status, existing = fetch_delivery(sent["external_delivery_id"])
+            except requests.RequestException as lookup_error:
+                lookup_status, existing = 500, {"error": f"Request failed: {str(lookup_error)}"}
+            if lookup_status != 200:
+                OutboxDispatcher.record_failure(cur, entry_id, tracking_id, operation, attempts, max_attempts, lookup_status, existing)
+                return
+            if not same_delivery(sent, existing):
+                OutboxDispatcher.record_failure(cur, entry_id, tracking_id, operation, attempts, max_attempts, status_code, {
+                    "error": "external_delivery_id is already used by a different DoorDash delivery",
+                    "detail": detail,
+                })
+                return
+            logger.info(f"Outbox entry {tracking_id} ({operation}) already exists at DoorDash, marking sent")
+            response = existing
+
+        if operation == "create_delivery" and response and sent is not None:
+            # committed together with the entry's sent status
+            insert_delivery(cur, sent)
+        cur.execute(
+            "UPDATE outbox SET status = 'sent', attempts = %s, response = %s WHERE id = %s",
+            (attempts, Jsonb(response), entry_id)
+        )
+        logger.info(f"Outbox entry {tracking_id} ({operation}) sent")
+
+    @staticmethod
+    def record_failure(cur, entry_id: int, tracking_id, operation: str, attempts: int, max_attempts: int,
+                       status_code: int, detail: Any):
+        from psycopg.types.json import Jsonb
+
+        if is_retryable(status_code) and attempts < max_attempts:
+            delay = retry_delay(attempts)
+            cur.execute(
+                "UPDATE outbox SET attempts = %s, last_error = %s, next_attempt_at = now() + make_interval(secs => %s) WHERE id = %s",
+                (attempts, Jsonb(detail), delay, entry_id)
+            )
+            logger.info(f"Outbox entry {tracking_id} ({operation}) failed with {status_code}, retrying in {delay}s")
+        else:
+            cur.execute(
+                "UPDATE outbox SET status = 'failed', attempts = %s, last_error = %s WHERE id = %s",
+                (attempts, Jsonb(detail), entry_id)
+            )
+            logger.error(f"Outbox entry {tracking_id} ({operation}) failed with {status_code} after {attempts} attempts")
+
+dispatcher = OutboxDispatcher()
@@ -0,0 +1,252 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from config.internal.internal_config import get_config
+from core.utils import add_query_field, insert_query, Ref
+from core.logging.logger import logger
+from fast_api_server.services.broadcaster import notify, status_update
+from fast_api_server.services.background import BackgroundTask
+from fast_api_server.services.schema import async_connect, connect, ensure_schema
+from fast_api_server.services.doordash_client import fetch_delivery
+
+if TYPE_CHECKING:
+    import psycopg
+    from psycopg.sql import Composed
+
+# pg_try_advisory_lock key held by the one worker which reconciles
+RECONCILE_LOCK_ID = 7_310_027
+
+# DoorDash delivery_status values after which a delivery no longer changes
+TERMINAL_STATUSES = {"delivered", "cancelled", "returned"}
+# Webhook event_name -> delivery_status, for payloads which carry no delivery_status
+EVENT_STATUSES = {
+    "DELIVERY_CREATED": "created",
+    "DASHER_CONFIRMED": "confirmed",
+    "DASHER_ENROUTE_TO_PICKUP": "enroute_to_pickup",
+    "DASHER_CONFIRMED_PICKUP_ARRIVAL": "arrived_at_pickup",
+    "DASHER_PICKED_UP": "picked_up",
+    "DASHER_ENROUTE_TO_DROPOFF": "enroute_to_dropoff",
+    "DASHER_CONFIRMED_DROPOFF_ARRIVAL": "arrived_at_dropoff",
+    "DASHER_DROPPED_OFF": "delivered",
+    "DELIVERY_CANCELLED": "cancelled",
+    "DELIVERY_RETURNED": "returned",
+}
+# Statuses where the dasher is moving and updates arrive quickly
+IN_TRANSIT_STATUSES = {"picked_up", "enroute_to_dropoff", "arrived_at_dropoff"}
+
+STALE_DELIVERIES_QUERY = """
+    SELECT d.id, d.store_id, d.order_data->>'external_delivery_id', d.created_at,
+           e.message, e.created_at
+    FROM deliveries d
+    LEFT JOIN LATERAL (
+        SELECT message, created_at
+        FROM events
+        WHERE delivery_id = d.id
+        ORDER BY created_at DESC
+        LIMIT 1
+    ) e ON true
+    WHERE d.created_at > now() - make_interval(hours => %s)
+      AND d.order_data->>'external_delivery_id' IS NOT NULL;
+"""
+
+
+def event_status(message: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Derive a delivery_status from a logged event message (API response or webhook payload)"""
+    if not isinstance(message, dict):
+        return None
+    status = message.get("delivery_status")
+    if status:
+        return status
+    return EVENT_STATUSES.get(message.get("event_name", ""))
+
+
+def poll_interval(age_seconds: float, status: Optional[str]) -> float:
+    """
+    Seconds to wait without any event before polling DoorDash for a delivery.
+
+    In-transit deliveries change fastest and are checked most often; deliveries
+    that have been open for hours are most likely stuck and are backed off.
+    """
+    if status in IN_TRANSIT_STATUSES:
+        interval = 60.0
+    elif status is None:
+        interval = 300.0
+    else:
+        interval = 120.0
+
+    if age_seconds > 6 * 3600:
+        interval *= 10
+    elif age_seconds > 2 * 3600:
+        interval *= 3
+    return min(interval, 3600.0)
+
+
+class RateLimiter:
+    """Spaces out calls so no more than `rate` start per second"""
+
+    def __init__(self, rate: float):
+        self.spacing = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.spacing
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class DeliveryReconciler(BackgroundTask):
+    """
+    Background task which finds non-terminal deliveries whose last event is older
+    than their polling interval, fetches their status from DoorDash and logs any
+    change as a new event. Covers webhooks which were lost or failed to log.
+
+    Every worker runs one, but only the worker holding RECONCILE_LOCK_ID scans, so
+    deliveries are polled (and rate limited) once across workers. The lock is held
+    on a dedicated connection and passes to another worker if this one goes away.
+    """
+
+    name = "Delivery reconciler"
+
+    def __init__(self):
+        super().__init__()
+        self.limiter: Optional[RateLimiter] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        # delivery id -> monotonic time of our last poll, so unchanged deliveries
+        # are not polled again on every scan
+        self.last_polled: Dict[int, float] = {}
+        self.lock_conn: Optional["psycopg.AsyncConnection"] = None
+
+    def start(self):
+        if self.task is None:
+            config = get_config()
+            self.limiter = RateLimiter(config.DOORDASH_RECONCILE_RATE_PER_SECOND)
+            self.semaphore = asyncio.Semaphore(max(1, config.DOORDASH_RECONCILE_CONCURRENCY))
+        super().start()
+
+    def interval(self) -> float:
+        return get_config().DOORDASH_RECONCILE_SCAN_SECONDS
+
+    async def stop(self):
+        await super().stop()
+        await self.release()
+
+    async def run_once(self):
+        if await self.lead():
+            await self.reconcile_once()
+
+    async def lead(self) -> bool:
+        """Whether this worker holds the reconcile lock, trying to take it if not"""
+        import psycopg
+
+        if self.lock_conn is not None:
+            try:
+                await self.lock_conn.execute("SELECT 1")
+                return True
+            except psycopg.Error:
+                # the server dropped our session, and with it the lock
+                logger.error("Lost the reconcile lock connection")
+                await self.release()
+
+        conn = await async_connect(autocommit=True)
+        cur = await conn.execute("SELECT pg_try_advisory_lock(%s)", (RECONCILE_LOCK_ID,))
+        row = await cur.fetchone()
+        if row and row[0]:
+            self.lock_conn = conn
+            # another worker may have polled since our last turn
+            self.last_polled.clear()
+            logger.info("This worker is now reconciling deliveries")
+            return True
+        await conn.close()
+        return False
+
+    async def release(self):
+        if self.lock_conn is not None:
+            # closing the session releases the advisory lock
+            await self.lock_conn.close()
+            self.lock_conn = None
+
+    async def reconcile_once(self) -> int:
+        """Run one scan; returns the number of deliveries polled"""
+        due = await asyncio.to_thread(self.find_due_deliveries)
+        if not due:
+            return 0
+        logger.info(f"Reconciling {len(due)} stale deliveries")
+        await asyncio.gather(*(self.reconcile(*row) for row in due))
+        return len(due)
+
+    def find_due_deliveries(self) -> List[Tuple[int, int, str, Optional[str]]]:
+        if not ensure_schema():
+            return []
+        config = get_config()
+        with connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(STALE_DELIVERIES_QUERY, (config.DOORDASH_RECONCILE_MAX_AGE_HOURS,))
+                rows = cur.fetchall()
+
+        now = time.time()
+        mono = time.monotonic()
+        due = []
+        open_ids = set()
+        for delivery_id, store_id, external_id, created_at, message, event_at in rows:
+            status = event_status(message)
+            if status in TERMINAL_STATUSES:
+                continue
+            open_ids.add(delivery_id)
+            interval = poll_interval(now - created_at.timestamp(), status)
+            last_seen = (event_at or created_at).timestamp()
+            if now - last_seen < interval:
+                continue
+            if mono - self.last_polled.get(delivery_id, float("-inf")) < interval:
+                continue
+            due.append((delivery_id, store_id, external_id, status))
+
+        # forget deliveries which have finished or aged out of the scan window
+        for delivery_id in list(self.last_polled):
+            if delivery_id not in open_ids:
+                del self.last_polled[delivery_id]
+        return due
+
+    async def reconcile(self, delivery_id: int, store_id: int, external_id: str, known_status: Optional[str]):
+        import requests
+
+        assert self.semaphore is not None and self.limiter is not None, "reconciler not started"
+        async with self.semaphore:
+            await self.limiter.wait()
+            self.last_polled[delivery_id] = time.monotonic()
+            try:
+                status_code, data = await asyncio.to_thread(fetch_delivery, external_id)
+            except requests.RequestException as e:
+                logger.error(f"Reconcile poll failed for delivery {external_id}: {str(e)}")
+                return
+            if status_code != 200:
+                logger.error(f"Reconcile poll for delivery {external_id} returned {status_code}")
+                return
+            if event_status(data) == known_status:
+                return
+            await asyncio.to_thread(log_reconciled_event, delivery_id, store_id, status_code, data)
+            logger.info(f"Reconciled delivery {external_id}: {known_status} -> {event_status(data)}")
+
+
+def log_reconciled_event(delivery_id: int, store_id: int, status_code: int, data: Dict[str, Any]):
+    from psycopg.types.json import Jsonb
+
+    fields : Ref[Composed | None ]= Ref(None)
+    field_values = []
+    field_values.append(add_query_field("status_code", {}, fields, status_code))
+    field_values.append(add_query_field("store_id", {}, fields, store_id))
+    field_values.append(add_query_field("delivery_id", {}, fields, delivery_id))
+    field_values.append(add_query_field("message", {}, fields, Jsonb({**data, "source": "reconciler"})))
+    with connect() as conn:
+        with conn.cursor() as cur:
+            if fields.value:
+                event_id = cur.execute(insert_query('events', fields.value, field_values)).fetchone()
+                notify(cur, status_update(data, store_id, delivery_id, event_id[0] if event_id else None))
+                conn.commit()
+                logger.info("Reconciled event logged to PostgreSQL events successfully")
+
+
+reconciler = DeliveryReconciler()
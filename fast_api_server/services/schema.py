@@ -0,0 +1,87 @@
+from typing import TYPE_CHECKING, List
+from config.internal.internal_config import get_config
+from core.logging.logger import logger
+
+if TYPE_CHECKING:
+    import psycopg
+
+
+def dsn() -> str:
+    return f"host=postgresql port=5432 dbname=doordash user=doordash password={get_config().DOORDASH_DB_PW} connect_timeout=10"
+
+
+def connect(**kwargs) -> "psycopg.Connection":
+    """Open a connection to the doordash database; kwargs are passed to psycopg.connect"""
+    import psycopg
+
+    return psycopg.connect(dsn(), **kwargs)
+
+
+async def async_connect(**kwargs) -> "psycopg.AsyncConnection":
+    import psycopg
+
+    return await psycopg.AsyncConnection.connect(dsn(), **kwargs)
+
+
+# postgres/schema.sql only runs when the postgres-data volume is first created;
+# these idempotent statements bring an existing database up to date
+MIGRATIONS: List[str] = [
+    "ALTER TABLE events ALTER COLUMN created_at SET DEFAULT now();",
+    "CREATE INDEX IF NOT EXISTS events_delivery_id_created_at_idx ON events USING btree (delivery_id, created_at DESC);",
+    # create_delivery used to store order_data as a JSON string scalar, which
+    # hides order_data->>'external_delivery_id' from webhooks and the reconciler
+    "UPDATE deliveries SET order_data = (order_data #>> '{}')::jsonb WHERE jsonb_typeof(order_data) = 'string';",
+    """
+    CREATE TABLE IF NOT EXISTS outbox (
+        id serial PRIMARY KEY,
+        tracking_id uuid NOT NULL UNIQUE,
+        operation text NOT NULL,
+        external_delivery_id text,
+        method text NOT NULL,
+        url text NOT NULL,
+        payload jsonb,
+        status text DEFAULT 'pending' NOT NULL,
+        attempts integer DEFAULT 0 NOT NULL,
+        next_attempt_at timestamp with time zone DEFAULT now() NOT NULL,
+        last_error jsonb,
+        response jsonb,
+        created_at timestamp with time zone DEFAULT now() NOT NULL,
+        updated_at timestamp with time zone DEFAULT now() NOT NULL,
+        CONSTRAINT outbox_status_check CHECK (status = ANY (ARRAY['pending', 'sent', 'failed']))
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS outbox_pending_idx ON outbox USING btree (next_attempt_at) WHERE (status = 'pending');",
+    "CREATE INDEX IF NOT EXISTS outbox_external_delivery_id_idx ON outbox USING btree (external_delivery_id, id) WHERE (status = 'pending');",
+    # external_delivery_id numbers; starts after the existing deliveries, whose
+    # ids used to be derived from max(deliveries.id) + 1
+    "CREATE SEQUENCE IF NOT EXISTS external_delivery_id_seq;",
+    "SELECT setval('external_delivery_id_seq', GREATEST((SELECT COALESCE(max(id), 0) + 1 FROM deliveries), (SELECT last_value FROM external_delivery_id_seq)));",
+    "CREATE OR REPLACE TRIGGER update_outbox_updated_at BEFORE UPDATE ON outbox FOR EACH ROW EXECUTE FUNCTION set_updated_at();",
+]
+
+# pg_advisory_xact_lock key so concurrent workers apply migrations one at a time
+MIGRATION_LOCK_ID = 7_310_026
+
+_schema_ready = False
+
+
+def ensure_schema() -> bool:
+    """Apply MIGRATIONS once per process; returns False (and retries next call) if PostgreSQL is unavailable"""
+    global _schema_ready
+    if _schema_ready:
+        return True
+    import psycopg
+
+    try:
+        with connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+                for statement in MIGRATIONS:
+                    cur.execute(statement)
+                conn.commit()
+    except psycopg.Error as db_error:
+        logger.error(f"Failed to apply PostgreSQL migrations: {str(db_error)}")
+        return False
+    _schema_ready = True
+    logger.info("PostgreSQL schema is up to date")
+    return True
@@ -86,7 +86,7 @@ CREATE TABLE public.events (
     store_id integer NOT NULL,
     delivery_id integer DEFAULT NULL,
     message jsonb NOT NULL,
-    created_at timestamp with time zone NOT NULL
+    created_at timestamp with time zone DEFAULT now() NOT NULL
 );
 
 
@@ -110,6 +110,49 @@ CREATE SEQUENCE public.events_id_seq
 ALTER SEQUENCE public.events_id_seq OWNED BY public.events.id;
 
 
+--
+-- Name: outbox; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.outbox (
+    id integer NOT NULL,
+    tracking_id uuid NOT NULL,
+    operation text NOT NULL,
+    external_delivery_id text,
+    method text NOT NULL,
+    url text NOT NULL,
+    payload jsonb,
+    status text DEFAULT 'pending'::text NOT NULL,
+    attempts integer DEFAULT 0 NOT NULL,
+    next_attempt_at timestamp with time zone DEFAULT now() NOT NULL,
+    last_error jsonb,
+    response jsonb,
+    created_at timestamp with time zone DEFAULT now() NOT NULL,
+    updated_at timestamp with time zone DEFAULT now() NOT NULL,
+    CONSTRAINT outbox_status_check CHECK ((status = ANY (ARRAY['pending'::text, 'sent'::text, 'failed'::text])))
+);
+
+
+--
+-- Name: outbox_id_seq; Type: SEQUENCE; Schema: public; Owner: -
+--
+
+CREATE SEQUENCE public.outbox_id_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+
+--
+-- Name: outbox_id_seq; Type: SEQUENCE OWNED BY; Schema: public; Owner: -
+--
+
+ALTER SEQUENCE public.outbox_id_seq OWNED BY public.outbox.id;
+
+
 --
 -- Name: stores; Type: TABLE; Schema: public; Owner: -
 --
@@ -157,6 +200,13 @@ ALTER TABLE ONLY public.deliveries ALTER COLUMN id SET DEFAULT nextval('public.d
 ALTER TABLE ONLY public.events ALTER COLUMN id SET DEFAULT nextval('public.events_id_seq'::regclass);
 
 
+--
+-- Name: outbox id; Type: DEFAULT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.outbox ALTER COLUMN id SET DEFAULT nextval('public.outbox_id_seq'::regclass);
+
+
 --
 -- Name: stores id; Type: DEFAULT; Schema: public; Owner: -
 --
@@ -180,6 +230,22 @@ ALTER TABLE ONLY public.events
     ADD CONSTRAINT events_pkey PRIMARY KEY (id);
 
 
+--
+-- Name: outbox outbox_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.outbox
+    ADD CONSTRAINT outbox_pkey PRIMARY KEY (id);
+
+
+--
+-- Name: outbox outbox_tracking_id_key; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.outbox
+    ADD CONSTRAINT outbox_tracking_id_key UNIQUE (tracking_id);
+
+
 --
 -- Name: stores stores_pkey; Type: CONSTRAINT; Schema: public; Owner: -
 --
@@ -188,6 +254,27 @@ ALTER TABLE ONLY public.stores
     ADD CONSTRAINT stores_pkey PRIMARY KEY (id);
 
 
+--
+-- Name: events_delivery_id_created_at_idx; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX events_delivery_id_created_at_idx ON public.events USING btree (delivery_id, created_at DESC);
+
+
+--
+-- Name: outbox_pending_idx; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX outbox_pending_idx ON public.outbox USING btree (next_attempt_at) WHERE (status = 'pending'::text);
+
+
+--
+-- Name: outbox_external_delivery_id_idx; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX outbox_external_delivery_id_idx ON public.outbox USING btree (external_delivery_id, id) WHERE (status = 'pending'::text);
+
+
 --
 -- Name: deliveries update_deliveries_updated_at; Type: TRIGGER; Schema: public; Owner: -
 --
@@ -195,6 +282,13 @@ ALTER TABLE ONLY public.stores
 CREATE TRIGGER update_deliveries_updated_at BEFORE UPDATE ON public.deliveries FOR EACH ROW EXECUTE FUNCTION public.set_updated_at();
 
 
+--
+-- Name: outbox update_outbox_updated_at; Type: TRIGGER; Schema: public; Owner: -
+--
+
+CREATE TRIGGER update_outbox_updated_at BEFORE UPDATE ON public.outbox FOR EACH ROW EXECUTE FUNCTION public.set_updated_at();
+
+
 --
 -- Name: deliveries deliveries_store_id_fkey1; Type: FK CONSTRAINT; Schema: public; Owner: -
 --
@@ -0,0 +1,75 @@
+import asyncio
+from fast_api_server.routers import stream
+from fast_api_server.services import broadcaster as broadcaster_module
+from fast_api_server.services.broadcaster import Subscription, broadcaster, status_update
+
+
+def test_offer_drops_oldest_when_full():
+    subscription = Subscription(None, None, maxsize=2)
+    for n in range(5):
+        subscription.offer({"n": n})
+
+    assert subscription.dropped == 3
+    assert [subscription.queue.get_nowait()["n"] for _ in range(2)] == [3, 4]
+
+
+def test_matches_store_and_delivery_filters():
+    update = {"store_id": 1, "external_delivery_id": "D-1"}
+
+    assert Subscription(None, None, 1).matches(update)
+    assert Subscription(1, None, 1).matches(update)
+    assert Subscription(1, "D-1", 1).matches(update)
+    assert not Subscription(2, None, 1).matches(update)
+    assert not Subscription(1, "D-2", 1).matches(update)
+
+
+def test_status_update_keeps_only_stream_fields():
+    update = status_update({"external_delivery_id": "D-1", "delivery_status": "picked_up", "items": ["x"] * 500}, 1, 7)
+
+    assert update["external_delivery_id"] == "D-1"
+    assert update["delivery_status"] == "picked_up"
+    assert update["delivery_id"] == 7
+    assert "items" not in update
+
+
+def test_status_update_carries_event_id():
+    assert status_update({"delivery_status": "picked_up"}, 1, 7, 42)["event_id"] == 42
+    assert status_update({"delivery_status": "picked_up"}, 1)["event_id"] is None
+
+
+def test_sse_sets_id_only_for_logged_events():
+    assert stream.sse({"event_id": 42, "delivery_status": "picked_up"}).startswith("id: 42\nevent: delivery_status\n")
+    assert stream.sse({"event_id": None}).startswith("event: delivery_status\n")
+
+
+class FakeRequest:
+    def __init__(self, checks: int):
+        self.checks = checks
+
+    async def is_disconnected(self):
+        self.checks -= 1
+        return self.checks < 0
+
+
+def test_stream_resumes_after_last_event_id(monkeypatch):
+    monkeypatch.setattr(broadcaster_module, "get_config", lambda: type("Config", (), {"DOORDASH_STREAM_QUEUE_SIZE": 10}))
+    replayed = []
+
+    def recent_updates(store_id, external_delivery_id, after):
+        replayed.append(after)
+        return [status_update({"external_delivery_id": "D-1", "delivery_status": "picked_up"}, 1, 7, 5)]
+    monkeypatch.setattr(stream, "recent_updates", recent_updates)
+
+    async def scenario():
+        response = await stream.stream_deliveries(FakeRequest(checks=2), None, "D-1", "4")
+        # arrives live as well as in the replay; sent once
+        broadcaster.publish(status_update({"external_delivery_id": "D-1", "delivery_status": "picked_up"}, 1, 7, 5))
+        broadcaster.publish(status_update({"external_delivery_id": "D-1", "delivery_status": "delivered"}, 1, 7, 6))
+        return [chunk async for chunk in response.body_iterator]
+
+    chunks = asyncio.run(scenario())
+
+    assert replayed == [4]
+    assert chunks[0] == "retry: 5000\n\n"
+    assert [chunk.split("\n", 1)[0] for chunk in chunks[1:]] == ["id: 5", "id: 6"]
+    assert not broadcaster.subscribers
@@ -0,0 +1,262 @@
+import json
+import os
+import pytest
+from fastapi import HTTPException
+from fast_api_server.routers import doordash as doordash_router
+from fast_api_server.services import outbox
+from fast_api_server.services.outbox import (
+    CLAIM_QUERY, OutboxDispatcher, already_created, is_retryable, retry_delay,
+)
+
+URL = "https://openapi.doordash.com/drive/v2/deliveries"
+
+
+def test_is_retryable():
+    for status_code in (408, 429, 500, 502, 503, 504):
+        assert is_retryable(status_code)
+    for status_code in (400, 401, 404, 409, 422):
+        assert not is_retryable(status_code)
+
+
+def test_retry_delay_doubles_and_caps():
+    assert [retry_delay(n) for n in range(1, 5)] == [10, 20, 40, 80]
+    assert retry_delay(20) == 900
+
+
+def test_same_delivery_compares_dropoff():
+    sent = {"dropoff_address": "901 Market Street, San Francisco, CA 94103", "dropoff_phone_number": "+1 (415) 555-0100"}
+
+    assert outbox.same_delivery(sent, {"dropoff_address": "901 Market Street, San Francisco, CA 94103, US",
+                                       "dropoff_phone_number": "+14155550100"})
+    assert not outbox.same_delivery(sent, {"dropoff_address": "1 Main St, Springfield", "dropoff_phone_number": "+14155550100"})
+    assert not outbox.same_delivery(sent, {"dropoff_address": sent["dropoff_address"], "dropoff_phone_number": "+14155550199"})
+
+
+def test_already_created_only_on_retried_create():
+    assert already_created("create_delivery", 409, 2)
+    assert not already_created("create_delivery", 409, 1)
+    assert not already_created("update_delivery", 409, 2)
+    assert not already_created("create_delivery", 502, 2)
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = {"assign": 0, "requests": [], "enqueued": [], "recorded": []}
+
+    def assign(json_data):
+        calls["assign"] += 1
+        json_data["external_delivery_id"] = "2026-01-01 - 7"
+        return json_data
+
+    def enqueue(operation, method, url, payload, external_delivery_id, attempts=0):
+        calls["enqueued"].append((operation, payload, external_delivery_id, attempts))
+        return "tracking-1"
+
+    monkeypatch.setattr(doordash_router, "assign_external_delivery_id", assign)
+    monkeypatch.setattr(outbox, "record_delivery", lambda order_data: calls["recorded"].append(order_data))
+    monkeypatch.setattr(outbox, "enqueue", enqueue)
+    monkeypatch.setattr(outbox, "has_pending", lambda external_delivery_id: any(
+        queued[2] == external_delivery_id for queued in calls["enqueued"]))
+    return calls
+
+
+def fail_with(monkeypatch, calls, status_code):
+    def request(method, url, json_data=None, assign_id=True):
+        calls["requests"].append((json_data, assign_id))
+        raise HTTPException(status_code=status_code, detail={"error": "boom"})
+    monkeypatch.setattr(doordash_router, "doordash_request", request)
+
+
+def test_send_or_enqueue_success(monkeypatch, calls):
+    def request(method, url, json_data=None, assign_id=True):
+        calls["requests"].append((json_data, assign_id))
+        return {"external_delivery_id": json_data["external_delivery_id"]}
+    monkeypatch.setattr(doordash_router, "doordash_request", request)
+
+    result = doordash_router.send_or_enqueue("create_delivery", "POST", URL, {"external_delivery_id": "x"}, None, None)
+
+    assert result == {"data": {"external_delivery_id": "2026-01-01 - 7"}}
+    assert calls["requests"] == [({"external_delivery_id": "2026-01-01 - 7"}, False)]
+    assert calls["recorded"] == [{"external_delivery_id": "2026-01-01 - 7"}]
+    assert calls["enqueued"] == []
+
+
+def test_send_or_enqueue_queues_retryable_failure(monkeypatch, calls):
+    fail_with(monkeypatch, calls, 503)
+
+    response = doordash_router.send_or_enqueue("create_delivery", "POST", URL, {"external_delivery_id": "x"}, None, None)
+
+    assert response.status_code == 202
+    assert json.loads(response.body) == {
+        "data": {"tracking_id": "tracking-1", "external_delivery_id": "2026-01-01 - 7", "status": "pending"}}
+    assert response.headers["location"] == "/doordash/outbox/tracking-1"
+    # queued under the id already sent once, so the retry can't create a second delivery
+    assert calls["assign"] == 1
+    assert calls["enqueued"] == [("create_delivery", {"external_delivery_id": "2026-01-01 - 7"}, "2026-01-01 - 7", 1)]
+    assert calls["recorded"] == []
+
+
+def test_send_or_enqueue_raises_non_retryable_failure(monkeypatch, calls):
+    fail_with(monkeypatch, calls, 400)
+
+    with pytest.raises(HTTPException) as excinfo:
+        doordash_router.send_or_enqueue("update_delivery", "PATCH", f"{URL}/D-1", {"tip": 5}, "D-1", None)
+
+    assert excinfo.value.status_code == 400
+    assert calls["assign"] == 0
+    assert calls["enqueued"] == []
+
+
+def test_send_or_enqueue_respond_async_skips_doordash(monkeypatch, calls):
+    fail_with(monkeypatch, calls, 500)
+
+    response = doordash_router.send_or_enqueue("cancel_delivery", "PUT", f"{URL}/D-1/cancel", None, "D-1", "respond-async")
+
+    assert response.status_code == 202
+    assert calls["requests"] == []
+    assert calls["enqueued"] == [("cancel_delivery", None, "D-1", 0)]
+
+
+def test_sync_cancel_queues_behind_queued_create(monkeypatch, calls):
+    fail_with(monkeypatch, calls, 503)
+    doordash_router.send_or_enqueue("create_delivery", "POST", URL, {"external_delivery_id": "x"}, None, None)
+    calls["requests"].clear()
+
+    response = doordash_router.send_or_enqueue(
+        "cancel_delivery", "PUT", f"{URL}/2026-01-01 - 7/cancel", None, "2026-01-01 - 7", None)
+
+    # cancelling before the create reaches DoorDash would 404, then the create would still go out
+    assert response.status_code == 202
+    assert calls["requests"] == []
+    assert [queued[0] for queued in calls["enqueued"]] == ["create_delivery", "cancel_delivery"]
+
+
+def test_spooled_for_matches_delivery(tmp_path):
+    (tmp_path / "1-a.json").write_text(json.dumps({"tracking_id": "a", "external_delivery_id": "D-1"}))
+
+    assert outbox.spooled_for(str(tmp_path), "D-1")
+    assert not outbox.spooled_for(str(tmp_path), "D-2")
+    assert not outbox.spooled_for(str(tmp_path / "missing"), "D-1")
+
+
+def test_record_delivery_spools_when_postgres_is_down(monkeypatch, tmp_path):
+    import psycopg
+
+    def unavailable():
+        raise psycopg.OperationalError("connection refused")
+    monkeypatch.setattr(outbox, "connect", unavailable)
+    monkeypatch.setattr(outbox, "get_config", lambda: type("Config", (), {"DOORDASH_OUTBOX_SPOOL_DIR": str(tmp_path)}))
+
+    outbox.record_delivery(PAYLOAD)
+
+    [name] = outbox.spooled_files(str(tmp_path))
+    entry = json.loads((tmp_path / name).read_text())
+    assert entry["operation"] == outbox.RECORD_OPERATION
+    assert entry["payload"] == PAYLOAD
+    # a spooled record is not a pending write, so it doesn't hold back sync updates
+    assert not outbox.spooled_for(str(tmp_path), "D-1")
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, query, params=None):
+        self.statements.append((query, params))
+        return self
+
+
+PAYLOAD = {"external_delivery_id": "D-1", "dropoff_address": "901 Market Street", "dropoff_phone_number": "+14155550100"}
+
+
+def dispatch(monkeypatch, status_code, operation="create_delivery", attempts=1, existing=(200, PAYLOAD)):
+
+    def request(method, url, json_data=None, assign_id=True):
+        assert assign_id is False
+        if status_code == 200:
+            return {"external_delivery_id": "D-1"}
+        raise HTTPException(status_code=status_code, detail={"error": "boom"})
+
+    monkeypatch.setattr(outbox, "doordash_request", request)
+    monkeypatch.setattr(outbox, "fetch_delivery", lambda external_delivery_id: existing)
+    cur = RecordingCursor()
+    OutboxDispatcher.send(cur, 1, "tracking-1", operation, "POST", URL, PAYLOAD, attempts, max_attempts=3)
+    recorded = [params[1].obj for query, params in cur.statements if query == outbox.RECORD_QUERY]
+    query, params = cur.statements[-1]
+    return query, params, recorded
+
+
+def test_send_marks_retried_create_conflict_as_sent(monkeypatch):
+    query, params, recorded = dispatch(monkeypatch, 409)
+
+    assert "status = 'sent'" in query
+    assert params[0] == 2
+    assert recorded == [PAYLOAD]
+
+
+def test_send_fails_create_conflict_with_another_delivery(monkeypatch):
+    other = {**PAYLOAD, "dropoff_address": "1 Main St, Springfield"}
+    query, params, recorded = dispatch(monkeypatch, 409, existing=(200, other))
+
+    assert "status = 'failed'" in query
+    assert recorded == []
+
+
+def test_send_retries_when_conflict_cannot_be_checked(monkeypatch):
+    query, params, recorded = dispatch(monkeypatch, 409, existing=(503, {"error": "unavailable"}))
+
+    assert "next_attempt_at" in query
+    assert recorded == []
+
+
+def test_send_schedules_retry_then_fails(monkeypatch):
+    query, params, recorded = dispatch(monkeypatch, 502, attempts=1)
+    assert "next_attempt_at" in query
+    assert params[2] == retry_delay(2)
+
+    query, params, recorded = dispatch(monkeypatch, 502, attempts=2)
+    assert "status = 'failed'" in query
+    assert recorded == []
+
+
+def test_send_fails_non_retryable_immediately(monkeypatch):
+    query, params, recorded = dispatch(monkeypatch, 422, operation="update_delivery")
+
+    assert "status = 'failed'" in query
+    assert params[0] == 2
+
+
+@pytest.mark.skipif(not os.environ.get("DOORDASH_TEST_DSN"), reason="set DOORDASH_TEST_DSN to run against PostgreSQL")
+def test_claim_query_keeps_per_delivery_order():
+    import psycopg
+
+    with psycopg.connect(os.environ["DOORDASH_TEST_DSN"]) as conn:
+        with conn.cursor() as cur:
+            # a temporary table shadows any real outbox for this session only
+            cur.execute(
+                """
+                CREATE TEMPORARY TABLE outbox (
+                    id serial PRIMARY KEY, tracking_id uuid DEFAULT gen_random_uuid(), operation text,
+                    external_delivery_id text, method text, url text, payload jsonb,
+                    status text DEFAULT 'pending', attempts integer DEFAULT 0,
+                    next_attempt_at timestamp with time zone DEFAULT now()
+                ) ON COMMIT DROP;
+                """
+            )
+            cur.execute(
+                """
+                INSERT INTO outbox (operation, external_delivery_id, next_attempt_at) VALUES
+                    ('create_delivery', 'A', now() + interval '1 hour'),
+                    ('update_delivery', 'A', now()),
+                    ('create_delivery', 'B', now());
+                """
+            )
+
+            # A's update waits behind A's create, which is backing off
+            claimed = cur.execute(CLAIM_QUERY).fetchone()
+            assert (claimed[2], claimed[0]) == ("create_delivery", 3)
+
+            cur.execute("UPDATE outbox SET status = 'sent' WHERE id IN (1, 3)")
+            claimed = cur.execute(CLAIM_QUERY).fetchone()
+            assert (claimed[2], claimed[0]) == ("update_delivery", 2)
+        conn.rollback()
@@ -0,0 +1,51 @@
+import sys
+from collections import Counter
+from core.profiling import profiler as profiler_module
+from core.profiling.profiler import RequestProfiler, classify, fold_stack
+
+
+def test_fold_stack_is_root_first():
+    def inner():
+        return fold_stack(sys._getframe())
+
+    stack = inner().split(";")
+    assert stack[-1] == f"{__name__}:inner"
+    assert stack[-2] == f"{__name__}:test_fold_stack_is_root_first"
+
+
+def test_classify_by_library():
+    assert classify("uvicorn.main:run;fast_api_server.routers.doordash:get_delivery;psycopg.connection:execute") == "postgres"
+    assert classify("uvicorn.main:run;fast_api_server.services.doordash_client:doordash_request;requests.api:request") == "upstream"
+    assert classify("uvicorn.main:run;fast_api_server.routers.doordash:create_delivery;json:dumps") == "python"
+
+
+def test_classify_idle_without_app_frames():
+    # selectors event loop, and uvloop whose wait happens in C below asyncio.run
+    assert classify("uvicorn.main:run;asyncio.base_events:run_forever;selectors:select") == "idle"
+    assert classify("uvicorn.main:run;uvicorn.server:run;asyncio.runners:run") == "idle"
+
+
+def test_summarize_percentages():
+    stacks = Counter({
+        "fast_api_server.main:handler;psycopg.cursor:execute": 2,
+        "fast_api_server.main:handler;requests.api:get": 1,
+        "asyncio.runners:run": 1,
+    })
+
+    assert RequestProfiler.summarize(stacks) == "idle=25%;postgres=50%;upstream=25%"
+    assert RequestProfiler.summarize(Counter()) == "no samples"
+
+
+def test_prune_keeps_newest_profiles(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiler_module, "get_config", lambda: type("Config", (), {
+        "DOORDASH_PROFILING_TOKEN": "", "DOORDASH_PROFILING_DIR": str(tmp_path), "DOORDASH_PROFILING_INTERVAL_MS": 5.0,
+        "DOORDASH_PROFILING_SLOW_MS": 100, "DOORDASH_PROFILING_MAX_FILES": 2,
+    }))
+    for name in ("20260101-000001-1ms-GET-a-slow.folded", "20260101-000002-1ms-GET-a-slow.folded",
+                 "20260101-000003-1ms-GET-a-slow.folded", "notes.txt"):
+        (tmp_path / name).write_text("")
+
+    RequestProfiler().prune()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "20260101-000002-1ms-GET-a-slow.folded", "20260101-000003-1ms-GET-a-slow.folded", "notes.txt"]
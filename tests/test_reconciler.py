@@ -0,0 +1,75 @@
+import asyncio
+from fast_api_server.services import reconciler as reconciler_module
+from fast_api_server.services.reconciler import (
+    TERMINAL_STATUSES, DeliveryReconciler, event_status, poll_interval,
+)
+
+
+def test_event_status_prefers_delivery_status():
+    assert event_status({"delivery_status": "picked_up", "event_name": "DASHER_CONFIRMED"}) == "picked_up"
+
+
+def test_event_status_maps_webhook_event_name():
+    assert event_status({"event_name": "DASHER_DROPPED_OFF"}) == "delivered"
+    assert event_status({"event_name": "DELIVERY_CANCELLED"}) in TERMINAL_STATUSES
+
+
+def test_event_status_unknown_or_missing():
+    assert event_status({"event_name": "SOMETHING_NEW"}) is None
+    assert event_status(None) is None
+    assert event_status("not a dict") is None  # type: ignore[arg-type]
+
+
+def test_poll_interval_by_status():
+    assert poll_interval(0, "enroute_to_dropoff") == 60
+    assert poll_interval(0, "confirmed") == 120
+    assert poll_interval(0, None) == 300
+
+
+def test_poll_interval_backs_off_with_age():
+    young = poll_interval(3600, "confirmed")
+    middle = poll_interval(3 * 3600, "confirmed")
+    old = poll_interval(8 * 3600, "confirmed")
+    assert young < middle < old
+
+
+def test_poll_interval_is_capped():
+    assert all(poll_interval(48 * 3600, status) <= 3600 for status in (None, "confirmed", "enroute_to_dropoff"))
+
+
+class FakeConnection:
+    def __init__(self, locked):
+        self.locked = locked
+        self.closed = False
+
+    async def execute(self, query, params=None):
+        return self
+
+    async def fetchone(self):
+        return (self.locked,)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_only_the_lock_holder_reconciles(monkeypatch):
+    connections = [FakeConnection(False), FakeConnection(True)]
+
+    async def connect(**kwargs):
+        return connections.pop(0)
+
+    monkeypatch.setattr(reconciler_module, "async_connect", connect)
+    reconciler = DeliveryReconciler()
+
+    async def scenario():
+        assert not await reconciler.lead()
+        assert await reconciler.lead()
+        # kept while the session lives, without asking PostgreSQL again
+        assert await reconciler.lead()
+        lock_conn = reconciler.lock_conn
+        await reconciler.release()
+        return lock_conn
+
+    lock_conn = asyncio.run(scenario())
+    assert lock_conn.closed
+    assert reconciler.lock_conn is None